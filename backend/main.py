@@ -4,16 +4,19 @@ FastAPI Backend Server for MCP Proof of Concept
 """
 
 import asyncio
-import json
 import os
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional
 from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 import httpx
+import orjson
 from dotenv import load_dotenv
 
 from llama_index.tools.mcp import McpToolSpec
@@ -22,10 +25,14 @@ from mcp_agents.handler_agent import create_mcp_agent_handler, MCPAgentHandler
 # Load environment variables
 load_dotenv()
 
-# Global variables
-mcp_client = None
-agent_handler = None
-mcp_tools = None
+@dataclass(slots=True)
+class AppState:
+    """Shared server components, stored on app.state.ctx"""
+    mcp_tools: Optional[McpToolSpec] = None
+    agent_handler: Optional[MCPAgentHandler] = None
+    http: Optional[httpx.AsyncClient] = None
+    # Set once both the MCP client and the agent handler are initialized
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
 
 class ChatRequest(BaseModel):
     message: str
@@ -36,13 +43,11 @@ class ChatResponse(BaseModel):
     session_id: str
     tools_used: List[str] = []
 
-async def initialize_mcp_client():
+async def initialize_mcp_client(ctx: AppState):
     """Initialize MCP client connection"""
-    global mcp_client, mcp_tools
-    
     try:
         # Create MCP tool spec connecting to local server
-        mcp_tools = McpToolSpec(
+        ctx.mcp_tools = McpToolSpec(
             server_url="http://127.0.0.1:8001",  # MCP server URL
             timeout=30.0
         )
@@ -54,12 +59,10 @@ async def initialize_mcp_client():
         print(f"❌ Failed to initialize MCP client: {e}")
         return False
 
-async def initialize_agent_handler():
+async def initialize_agent_handler(ctx: AppState):
     """Initialize the agent handler"""
-    global agent_handler
-    
     try:
-        agent_handler = create_mcp_agent_handler()
+        ctx.agent_handler = create_mcp_agent_handler(http_client=ctx.http)
         print("✅ Agent handler initialized successfully")
         return True
         
@@ -67,21 +70,125 @@ async def initialize_agent_handler():
         print(f"❌ Failed to initialize agent handler: {e}")
         return False
 
+def refresh_status_payloads(app: FastAPI):
+    """Pre-serialize the / and /health payloads from the current component state"""
+    ctx: AppState = app.state.ctx
+    app.state.root_bytes = orjson.dumps({
+        "message": "MCP Proof of Concept Backend",
+        "status": "running",
+        "mcp_connected": ctx.mcp_tools is not None,
+        "agent_ready": ctx.agent_handler is not None
+    })
+    app.state.health_bytes = orjson.dumps({
+        "status": "healthy",
+        "components": {
+            "mcp_client": ctx.mcp_tools is not None,
+            "agent_handler": ctx.agent_handler is not None,
+            "tools": ctx.mcp_tools is not None
+        }
+    })
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for FastAPI"""
     print("🚀 Starting MCP Backend Server...")
     
+    ctx = app.state.ctx = AppState()
+    
+    # Shared HTTP client so outbound calls reuse pooled keep-alive connections
+    ctx.http = httpx.AsyncClient(
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=100, max_connections=200)
+    )
+    
     # Initialize components
-    mcp_success = await initialize_mcp_client()
-    agent_success = await initialize_agent_handler()
+    mcp_success = await initialize_mcp_client(ctx)
+    agent_success = await initialize_agent_handler(ctx)
     
     if not mcp_success or not agent_success:
         print("⚠️  Some components failed to initialize, but server will continue")
+    else:
+        ctx.ready.set()
+    
+    refresh_status_payloads(app)
     
     yield
     
     print("🛑 Shutting down MCP Backend Server...")
+    await ctx.http.aclose()
+
+async def require_ready(request: Request):
+    """Dependency rejecting requests until the MCP client and agent handler are ready"""
+    if not request.app.state.ctx.ready.is_set():
+        raise HTTPException(status_code=503, detail="MCP client or agent handler not initialized")
+
+async def coalesce_tokens(
+    tokens: AsyncIterator[str],
+    max_chunk_size: int = 4096,
+    max_delay: float = 0.02
+) -> AsyncIterator[str]:
+    """
+    Group streamed tokens into larger chunks to cut per-frame write overhead.
+    
+    The first token is passed through immediately. After that, tokens are buffered
+    until the buffer reaches max_chunk_size characters or the oldest buffered token
+    has waited max_delay seconds, whichever comes first.
+    """
+    iterator = tokens.__aiter__()
+    buffer: List[str] = []
+    size = 0
+    deadline = 0.0
+    first = True
+    pending = None
+    
+    try:
+        while True:
+            # Keep one __anext__ in flight; a timeout must not cancel the generator
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            
+            timeout = max(0.0, deadline - time.monotonic()) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield "".join(buffer)
+                buffer, size = [], 0
+                continue
+            
+            try:
+                token = pending.result()
+            except StopAsyncIteration:
+                break
+            except Exception:
+                # Deliver what was already received before surfacing the error
+                if buffer:
+                    yield "".join(buffer)
+                raise
+            finally:
+                pending = None
+            
+            if first:
+                first = False
+                yield token
+                continue
+            
+            if not buffer:
+                deadline = time.monotonic() + max_delay
+            buffer.append(token)
+            size += len(token)
+            if size >= max_chunk_size:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            # Let the cancellation finish so the upstream generator is no longer running
+            await asyncio.wait({pending})
+        # Close upstream now rather than whenever its finalizer happens to run
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
 
 # Create FastAPI app
 app = FastAPI(
@@ -100,121 +207,108 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON responses; small bodies skip compression. The SSE stream
+# sets Content-Encoding: identity, which GZipMiddleware passes through untouched
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Root endpoint"""
-    return {
-        "message": "MCP Proof of Concept Backend",
-        "status": "running",
-        "mcp_connected": mcp_client is not None,
-        "agent_ready": agent_handler is not None
-    }
+    return Response(content=request.app.state.root_bytes, media_type="application/json")
 
 @app.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint"""
-    return {
-        "status": "healthy",
-        "components": {
-            "mcp_client": mcp_client is not None,
-            "agent_handler": agent_handler is not None,
-            "tools": mcp_tools is not None
-        }
-    }
+    return Response(content=request.app.state.health_bytes, media_type="application/json")
 
-@app.get("/tools")
-async def get_available_tools():
-    """Get list of available MCP tools"""
-    global mcp_tools, agent_handler
-    
-    if not mcp_tools or not agent_handler:
-        raise HTTPException(status_code=503, detail="MCP client or agent handler not initialized")
+@app.get("/tools", dependencies=[Depends(require_ready)])
+async def get_available_tools(request: Request):
+    """Get list of available MCP tools, streamed as newline-delimited JSON"""
+    ctx: AppState = request.app.state.ctx
     
+    # Fetch before streaming so a failure can still be reported as a 500
     try:
-        tools_info = agent_handler.get_available_tools_info([mcp_tools])
-        return {
-            "tools": tools_info,
-            "count": len(tools_info)
-        }
+        tools_info = await ctx.agent_handler.get_available_tools_info([ctx.mcp_tools])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching tools: {str(e)}")
+    
+    async def generate_tools():
+        # One JSON object per line so clients can parse tools as they arrive
+        for tool_info in tools_info:
+            yield orjson.dumps(tool_info) + b"\n"
+    
+    return StreamingResponse(generate_tools(), media_type="application/x-ndjson")
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(require_ready)])
+async def chat_endpoint(chat_request: ChatRequest, request: Request):
     """Main chat endpoint for processing user queries"""
-    global mcp_tools, agent_handler
-    
-    if not mcp_tools or not agent_handler:
-        raise HTTPException(status_code=503, detail="MCP client or agent handler not initialized")
+    ctx: AppState = request.app.state.ctx
     
     try:
         # Process the query using the agent
-        response = await agent_handler.process_query(
-            query=request.message,
-            tools=[mcp_tools]
+        response = await ctx.agent_handler.process_query(
+            query=chat_request.message,
+            tools=[ctx.mcp_tools]
         )
         
         return ChatResponse(
             response=response,
-            session_id=request.session_id,
+            session_id=chat_request.session_id,
             tools_used=[]  # TODO: Track which tools were used
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
 
-@app.post("/chat/stream")
-async def chat_stream_endpoint(request: ChatRequest):
+@app.post("/chat/stream", dependencies=[Depends(require_ready)])
+async def chat_stream_endpoint(chat_request: ChatRequest, request: Request):
     """Streaming chat endpoint for real-time responses"""
-    global mcp_tools, agent_handler
-    
-    if not mcp_tools or not agent_handler:
-        raise HTTPException(status_code=503, detail="MCP client or agent handler not initialized")
+    ctx: AppState = request.app.state.ctx
     
     async def generate_response():
         try:
-            # For now, we'll simulate streaming by yielding the full response
-            # In a real implementation, you'd integrate with streaming LLM APIs
-            response = await agent_handler.process_query(
-                query=request.message,
-                tools=[mcp_tools]
-            )
-            
-            # Simulate streaming by yielding chunks
-            words = response.split()
-            for i, word in enumerate(words):
+            # Forward tokens as the LLM generates them, a few per frame
+            async for token in coalesce_tokens(ctx.agent_handler.process_query_stream(
+                query=chat_request.message,
+                tools=[ctx.mcp_tools]
+            )):
                 chunk = {
-                    "response": word + " ",
-                    "session_id": request.session_id,
-                    "is_final": i == len(words) - 1
+                    "response": token,
+                    "session_id": chat_request.session_id,
+                    "is_final": False
                 }
-                yield f"data: {json.dumps(chunk)}\n\n"
-                await asyncio.sleep(0.05)  # Small delay for streaming effect
+                yield b"data: " + orjson.dumps(chunk) + b"\n\n"
+            
+            final_chunk = {
+                "response": "",
+                "session_id": chat_request.session_id,
+                "is_final": True
+            }
+            yield b"data: " + orjson.dumps(final_chunk) + b"\n\n"
                 
         except Exception as e:
             error_chunk = {
                 "error": str(e),
-                "session_id": request.session_id,
+                "session_id": chat_request.session_id,
                 "is_final": True
             }
-            yield f"data: {json.dumps(error_chunk)}\n\n"
+            yield b"data: " + orjson.dumps(error_chunk) + b"\n\n"
     
     return StreamingResponse(
         generate_response(),
-        media_type="text/plain",
+        media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # Stop nginx and similar proxies from buffering
+            "Content-Encoding": "identity",
         }
     )
 
-@app.post("/tools/test/{tool_name}")
-async def test_tool(tool_name: str, parameters: Dict[str, Any] = None):
+@app.post("/tools/test/{tool_name}", dependencies=[Depends(require_ready)])
+async def test_tool(request: Request, tool_name: str, parameters: Dict[str, Any] = None):
     """Test a specific MCP tool"""
-    global mcp_tools, agent_handler
-    
-    if not mcp_tools or not agent_handler:
-        raise HTTPException(status_code=503, detail="MCP client or agent handler not initialized")
+    ctx: AppState = request.app.state.ctx
     
     try:
         # Create a test query for the tool
@@ -224,9 +318,9 @@ async def test_tool(tool_name: str, parameters: Dict[str, Any] = None):
         else:
             test_query = f"Use the {tool_name} tool"
         
-        response = await agent_handler.process_query(
+        response = await ctx.agent_handler.process_query(
             query=test_query,
-            tools=[mcp_tools]
+            tools=[ctx.mcp_tools]
         )
         
         return {
@@ -252,11 +346,18 @@ async def startup_event():
 if __name__ == "__main__":
     import uvicorn
     
+    # Auto-reload is single-process, so it is only enabled for development
+    if os.getenv("DEV"):
+        server_options = {"reload": True}
+    else:
+        server_options = {"workers": int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))}
+    
+    # The default loop/http settings ("auto") pick uvloop and httptools when installed
     print("🚀 Starting MCP Backend Server...")
     uvicorn.run(
         "main:app",
         host="127.0.0.1",
         port=8000,
-        reload=True,
-        log_level="info"
+        log_level="info",
+        **server_options
     ) 
\ No newline at end of file
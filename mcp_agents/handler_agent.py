@@ -3,37 +3,246 @@
 MCP Agent Handler for managing LLM interactions and tool execution
 """
 
+import asyncio
 import os
-from typing import List, Optional
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
 from dotenv import load_dotenv
+import httpx
+import numpy as np
 
 from llama_index.llms.openai import OpenAI
+from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.tools.mcp import McpToolSpec
 from llama_index.core.agent import FunctionCallingAgentWorker
-from llama_index.core.agent.workflow import AgentWorkflow
+from llama_index.core.agent.workflow import AgentStream, AgentWorkflow, FunctionAgent, ToolCallResult
 from llama_index.core.tools import BaseTool
 
 # Load environment variables
 load_dotenv()
 
+# How long fetched MCP tool lists (and agents built from them) stay valid
+TOOL_CACHE_TTL_SECONDS = 300.0
+
+# Response cache TTLs by the tools a response used; 0 means never cache
+DEFAULT_RESPONSE_TTL_SECONDS = 600.0
+UNKNOWN_TOOL_RESPONSE_TTL_SECONDS = 60.0
+TOOL_RESPONSE_TTL_SECONDS = {
+    "calculate_bmi": 3600.0,
+    "calculate_compound_interest": 3600.0,
+    "calculate_tip": 3600.0,
+    "convert_temperature": 3600.0,
+    "get_weather": 60.0,
+    "get_random_quote": 0.0,
+    "generate_password": 0.0,
+}
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+@dataclass
+class _CacheEntry:
+    response: str
+    expires_at: float
+    row: Optional[int]
+
+class ResponseCache:
+    """
+    Two-tier cache for agent responses.
+    
+    Exact matches are looked up by normalized query text. On a miss the query
+    is embedded and compared against all cached embeddings with a single
+    matrix-vector product; the closest entry is returned if its cosine
+    similarity clears the threshold. Only entries stored with semantic=True
+    (answers that used no tools) take part in the semantic tier, restricted to
+    the same tool set and the same numbers. Tool-derived answers depend on
+    inputs an embedding cannot reliably tell apart ("100c to f" vs "100f to c"),
+    so they are served from the exact tier only.
+    """
+    
+    def __init__(
+        self,
+        embed_model: Optional[OpenAIEmbedding] = None,
+        max_entries: int = 1024,
+        similarity_threshold: float = 0.95
+    ):
+        """
+        Initialize the response cache
+        
+        Args:
+            embed_model: Embedding model for the semantic tier (optional, exact-only if omitted)
+            max_entries: Maximum number of cached responses before LRU eviction
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+        """
+        self.embed_model = embed_model
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        
+        self._entries: "OrderedDict[Tuple[str, int], _CacheEntry]" = OrderedDict()
+        self._embedding_memo: "OrderedDict[str, Optional[np.ndarray]]" = OrderedDict()
+        
+        # Semantic tier, one row per cached entry; the matrix is allocated on first use
+        self._embeddings: Optional[np.ndarray] = None
+        self._scopes = np.zeros(max_entries, dtype=np.int64)
+        self._live = np.zeros(max_entries, dtype=bool)
+        self._row_keys: List[Optional[Tuple[str, int]]] = [None] * max_entries
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+    
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return " ".join(query.casefold().split())
+    
+    @staticmethod
+    def _scope(query: str, tool_key: int) -> int:
+        return hash((tool_key, tuple(_NUMBER_RE.findall(query))))
+    
+    async def _embed(self, query: str) -> Optional[np.ndarray]:
+        """Embed a normalized query as a unit float32 vector, or None if unavailable"""
+        if self.embed_model is None:
+            return None
+        if query in self._embedding_memo:
+            self._embedding_memo.move_to_end(query)
+            return self._embedding_memo[query]
+        
+        try:
+            vector = np.asarray(await self.embed_model.aget_query_embedding(query), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm else None
+        except Exception as e:
+            # Not memoized, so a transient failure doesn't disable this query for good
+            print(f"⚠️  Query embedding failed, using exact-match cache only: {e}")
+            return None
+        
+        self._embedding_memo[query] = vector
+        if len(self._embedding_memo) > self.max_entries:
+            self._embedding_memo.popitem(last=False)
+        return vector
+    
+    def _evict(self, key: Tuple[str, int]) -> None:
+        entry = self._entries.pop(key)
+        if entry.row is not None:
+            self._live[entry.row] = False
+            self._row_keys[entry.row] = None
+            self._free_rows.append(entry.row)
+    
+    async def get(self, query: str, tool_key: int) -> Optional[str]:
+        """
+        Look up a cached response for a query
+        
+        Args:
+            query: User query string
+            tool_key: Hash identifying the tool set the query runs against
+            
+        Returns:
+            Cached response string, or None on a miss
+        """
+        normalized = self._normalize(query)
+        key = (normalized, tool_key)
+        now = time.monotonic()
+        
+        entry = self._entries.get(key)
+        if entry is None and self._embeddings is not None and self._live.any():
+            vector = await self._embed(normalized)
+            if vector is not None:
+                similarities = self._embeddings @ vector
+                mask = self._live & (self._scopes == self._scope(normalized, tool_key))
+                similarities[~mask] = -1.0
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    key = self._row_keys[best]
+                    entry = self._entries.get(key)
+        
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._evict(key)
+            return None
+        
+        self._entries.move_to_end(key)
+        return entry.response
+    
+    async def put(
+        self,
+        query: str,
+        tool_key: int,
+        response: str,
+        ttl_seconds: float,
+        semantic: bool = False
+    ) -> None:
+        """
+        Store a response for a query
+        
+        Args:
+            query: User query string
+            tool_key: Hash identifying the tool set the query ran against
+            response: Agent response string
+            ttl_seconds: How long the response stays valid (not stored if <= 0)
+            semantic: Whether similar queries may be answered with this response
+        """
+        if ttl_seconds <= 0:
+            return
+        
+        normalized = self._normalize(query)
+        key = (normalized, tool_key)
+        vector = await self._embed(normalized) if semantic else None
+        
+        # No awaits below: concurrent puts must not interleave the row bookkeeping
+        if key in self._entries:
+            self._evict(key)
+        while len(self._entries) >= self.max_entries:
+            self._evict(next(iter(self._entries)))
+        
+        row = None
+        if vector is not None:
+            if self._embeddings is None:
+                self._embeddings = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            row = self._free_rows.pop()
+            self._embeddings[row] = vector
+            self._scopes[row] = self._scope(normalized, tool_key)
+            self._live[row] = True
+            self._row_keys[row] = key
+        
+        self._entries[key] = _CacheEntry(
+            response=response,
+            expires_at=time.monotonic() + ttl_seconds,
+            row=row
+        )
+
 class MCPAgentHandler:
     """
     Handler class for managing MCP agents with LLM integration
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, http_client: Optional[httpx.AsyncClient] = None):
         """
         Initialize the MCP Agent Handler
         
         Args:
             api_key: OpenAI API key (optional, will use env var if not provided)
+            http_client: Shared async HTTP client for outbound LLM calls (optional)
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key is required. Set OPENAI_API_KEY environment variable or pass api_key parameter.")
         
+        self.http_client = http_client
         self.llm = self._initialize_llm()
         self.system_prompt = self._get_system_prompt()
+        
+        # Caches keyed on tool spec identity, entries are (created_at, value)
+        self._tool_list_cache: Dict[int, Tuple[float, List[BaseTool]]] = {}
+        self._agent_cache: Dict[tuple, Tuple[float, Any]] = {}
+        self._agent_lock = asyncio.Lock()
+        
+        self.response_cache = ResponseCache(
+            embed_model=OpenAIEmbedding(
+                api_key=self.api_key,
+                model="text-embedding-3-small",
+                async_http_client=self.http_client
+            )
+        )
     
     def _initialize_llm(self) -> OpenAI:
         """
@@ -46,7 +255,8 @@ class MCPAgentHandler:
             api_key=self.api_key,
             model="gpt-4-turbo-preview",
             temperature=0.1,
-            max_tokens=1000
+            max_tokens=1000,
+            async_http_client=self.http_client
         )
     
     def _get_system_prompt(self) -> str:
@@ -71,7 +281,26 @@ If a tool returns an error, explain the issue and suggest how to fix it.
 
 Be conversational and friendly while maintaining professionalism."""
     
-    def get_agent(self, tools: List[McpToolSpec]) -> FunctionCallingAgentWorker:
+    async def _get_tool_list(self, tool: McpToolSpec) -> List[BaseTool]:
+        """
+        Get the tool list for an MCP tool spec, reusing a recent fetch
+        
+        Args:
+            tool: MCP tool specification
+            
+        Returns:
+            List of LlamaIndex tools exposed by the MCP server
+        """
+        now = time.monotonic()
+        cached = self._tool_list_cache.get(id(tool))
+        if cached and now - cached[0] < TOOL_CACHE_TTL_SECONDS:
+            return cached[1]
+        
+        tool_list = await tool.to_tool_list_async()
+        self._tool_list_cache[id(tool)] = (now, tool_list)
+        return tool_list
+    
+    async def get_agent(self, tools: List[McpToolSpec]) -> FunctionCallingAgentWorker:
         """
         Create and return a function calling agent with the provided MCP tools
         
@@ -81,26 +310,111 @@ Be conversational and friendly while maintaining professionalism."""
         Returns:
             FunctionCallingAgentWorker instance
         """
-        # Convert MCP tools to LlamaIndex tools if needed
+        return self._build_agent_worker(await self._get_agent_tools(tools))
+    
+    def _build_agent_worker(self, agent_tools: List[BaseTool]) -> FunctionCallingAgentWorker:
+        """
+        Build a function calling agent worker from resolved LlamaIndex tools
+        
+        Args:
+            agent_tools: List of LlamaIndex tools
+            
+        Returns:
+            FunctionCallingAgentWorker instance
+        """
+        return FunctionCallingAgentWorker.from_tools(
+            tools=agent_tools,
+            llm=self.llm,
+            system_prompt=self.system_prompt,
+            verbose=True
+        )
+    
+    async def _get_agent_tools(self, tools: List[McpToolSpec]) -> List[BaseTool]:
+        """
+        Resolve MCP tool specs into LlamaIndex tools without blocking the event loop
+        
+        Args:
+            tools: List of MCP tool specifications
+            
+        Returns:
+            List of LlamaIndex tools, in input order
+        """
+        tool_lists = iter(await self._fetch_tool_lists(tools))
+        
         agent_tools = []
         for tool in tools:
             if isinstance(tool, McpToolSpec):
-                # Convert McpToolSpec to BaseTool
-                agent_tools.extend(tool.to_tool_list())
+                agent_tools.extend(next(tool_lists))
             elif isinstance(tool, BaseTool):
                 agent_tools.append(tool)
         
-        # Create the agent worker
-        agent_worker = FunctionCallingAgentWorker.from_tools(
+        return agent_tools
+    
+    def _build_stream_agent(self, agent_tools: List[BaseTool]) -> FunctionAgent:
+        """
+        Build a workflow-based function agent, which supports token streaming
+        
+        Args:
+            agent_tools: List of LlamaIndex tools
+            
+        Returns:
+            FunctionAgent instance
+        """
+        return FunctionAgent(
             tools=agent_tools,
             llm=self.llm,
-            system_prompt=self.system_prompt,
-            verbose=True
+            system_prompt=self.system_prompt
         )
+    
+    async def _get_cached(self, kind: str, tools: List[McpToolSpec], build: Callable[[List[BaseTool]], Any]) -> Any:
+        """
+        Return a cached agent of the given kind, building it only on a cache miss
+        
+        Args:
+            kind: Cache namespace for the agent type
+            tools: List of MCP tool specifications
+            build: Builds the agent from resolved LlamaIndex tools
+            
+        Returns:
+            Agent instance
+        """
+        key = (kind,) + tuple(id(t) for t in tools)
         
-        return agent_worker
+        # Serialize builds so concurrent first requests don't each construct an agent
+        async with self._agent_lock:
+            cached = self._agent_cache.get(key)
+            if cached and time.monotonic() - cached[0] < TOOL_CACHE_TTL_SECONDS:
+                return cached[1]
+            
+            agent = build(await self._get_agent_tools(tools))
+            self._agent_cache[key] = (time.monotonic(), agent)
+            return agent
     
-    def create_agent_workflow(self, tools: List[McpToolSpec]) -> AgentWorkflow:
+    async def get_cached_agent(self, tools: List[McpToolSpec]) -> FunctionCallingAgentWorker:
+        """
+        Return an agent for the provided tools, building it only on a cache miss
+        
+        Args:
+            tools: List of MCP tool specifications
+            
+        Returns:
+            FunctionCallingAgentWorker instance
+        """
+        return await self._get_cached("worker", tools, self._build_agent_worker)
+    
+    async def get_cached_stream_agent(self, tools: List[McpToolSpec]) -> FunctionAgent:
+        """
+        Return a streaming-capable agent for the provided tools, cached like get_cached_agent
+        
+        Args:
+            tools: List of MCP tool specifications
+            
+        Returns:
+            FunctionAgent instance
+        """
+        return await self._get_cached("stream", tools, self._build_stream_agent)
+    
+    async def create_agent_workflow(self, tools: List[McpToolSpec]) -> AgentWorkflow:
         """
         Create an agent workflow with the provided tools
         
@@ -110,7 +424,7 @@ Be conversational and friendly while maintaining professionalism."""
         Returns:
             AgentWorkflow instance
         """
-        agent_worker = self.get_agent(tools)
+        agent_worker = await self.get_agent(tools)
         
         # Create workflow
         workflow = AgentWorkflow(
@@ -133,7 +447,12 @@ Be conversational and friendly while maintaining professionalism."""
             Agent response string
         """
         try:
-            agent_worker = self.get_agent(tools)
+            tool_key = hash(tuple(id(t) for t in tools))
+            cached = await self.response_cache.get(query, tool_key)
+            if cached is not None:
+                return cached
+            
+            agent_worker = await self.get_cached_agent(tools)
             
             # Create agent executor
             agent = agent_worker.as_agent()
@@ -141,12 +460,119 @@ Be conversational and friendly while maintaining professionalism."""
             # Process the query
             response = await agent.achat(query)
             
+            sources = getattr(response, "sources", [])
+            used_tools = [source.tool_name for source in sources]
+            
+            # A failed tool call yields an apology, not an answer worth caching
+            if not any(source.is_error for source in sources):
+                await self.response_cache.put(
+                    query, tool_key, str(response), self._response_ttl(used_tools),
+                    semantic=not used_tools
+                )
+            
             return str(response)
             
         except Exception as e:
             return f"Error processing query: {str(e)}"
     
-    def get_available_tools_info(self, tools: List[McpToolSpec]) -> List[dict]:
+    async def process_query_stream(self, query: str, tools: List[McpToolSpec]) -> AsyncIterator[str]:
+        """
+        Process a user query, yielding response tokens as the LLM produces them
+        
+        Args:
+            query: User query string
+            tools: List of MCP tool specifications
+            
+        Yields:
+            Response text fragments
+        """
+        tool_key = hash(tuple(id(t) for t in tools))
+        cached = await self.response_cache.get(query, tool_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        # FunctionCallingAgentWorker cannot stream, so this path runs a FunctionAgent
+        agent = await self.get_cached_stream_agent(tools)
+        handler = agent.run(user_msg=query)
+        
+        parts = []
+        used_tools = []
+        tool_failed = False
+        try:
+            async for event in handler.stream_events():
+                if isinstance(event, AgentStream):
+                    if event.delta:
+                        parts.append(event.delta)
+                        yield event.delta
+                elif isinstance(event, ToolCallResult):
+                    used_tools.append(event.tool_name)
+                    tool_failed = tool_failed or event.tool_output.is_error
+            
+            await handler
+        finally:
+            # Stop the workflow if the client went away mid-stream
+            if not handler.done():
+                await handler.cancel_run()
+        
+        # A failed tool call yields an apology, not an answer worth caching
+        if not tool_failed:
+            await self.response_cache.put(
+                query, tool_key, "".join(parts), self._response_ttl(used_tools),
+                semantic=not used_tools
+            )
+    
+    @staticmethod
+    def _response_ttl(used_tools: Iterable[str]) -> float:
+        """
+        Get how long a response may be cached, given the tools it used
+        
+        Args:
+            used_tools: Names of the tools called while answering
+            
+        Returns:
+            TTL in seconds, the shortest among the tools used
+        """
+        ttl = DEFAULT_RESPONSE_TTL_SECONDS
+        for name in used_tools:
+            ttl = min(ttl, TOOL_RESPONSE_TTL_SECONDS.get(name, UNKNOWN_TOOL_RESPONSE_TTL_SECONDS))
+        return ttl
+    
+    async def _fetch_tool_lists(self, tools: List[McpToolSpec]) -> List[List[BaseTool]]:
+        """
+        Fetch the tool lists of all MCP tool specs concurrently
+        
+        Args:
+            tools: List of MCP tool specifications
+            
+        Returns:
+            One tool list per McpToolSpec, in input order
+        """
+        return await asyncio.gather(*(
+            self._get_tool_list(tool)
+            for tool in tools
+            if isinstance(tool, McpToolSpec)
+        ))
+    
+    async def iter_available_tools_info(self, tools: List[McpToolSpec]) -> AsyncIterator[dict]:
+        """
+        Yield information about available tools one at a time
+        
+        Args:
+            tools: List of MCP tool specifications
+            
+        Yields:
+            Tool information dictionaries
+        """
+        for tool_list in await self._fetch_tool_lists(tools):
+            for t in tool_list:
+                yield {
+                    "name": t.metadata.name,
+                    "description": t.metadata.description,
+                    "parameters": t.metadata.get_parameters_dict()
+                }
+    
+    async def get_available_tools_info(self, tools: List[McpToolSpec]) -> List[dict]:
         """
         Get information about available tools
         
@@ -156,29 +582,21 @@ Be conversational and friendly while maintaining professionalism."""
         Returns:
             List of tool information dictionaries
         """
-        tools_info = []
-        
-        for tool in tools:
-            if isinstance(tool, McpToolSpec):
-                tool_list = tool.to_tool_list()
-                for t in tool_list:
-                    tools_info.append({
-                        "name": t.metadata.name,
-                        "description": t.metadata.description,
-                        "parameters": getattr(t.metadata, 'fn_schema', None)
-                    })
-        
-        return tools_info
+        return [tool_info async for tool_info in self.iter_available_tools_info(tools)]
 
 # Factory function for easy agent creation
-def create_mcp_agent_handler(api_key: Optional[str] = None) -> MCPAgentHandler:
+def create_mcp_agent_handler(
+    api_key: Optional[str] = None,
+    http_client: Optional[httpx.AsyncClient] = None
+) -> MCPAgentHandler:
     """
     Factory function to create an MCP Agent Handler
     
     Args:
         api_key: OpenAI API key (optional)
+        http_client: Shared async HTTP client (optional)
         
     Returns:
         MCPAgentHandler instance
     """
-    return MCPAgentHandler(api_key=api_key)
+    return MCPAgentHandler(api_key=api_key, http_client=http_client)
@@ -4,19 +4,25 @@ Multi-tool MCP Server with various utility functions
 """
 
 import asyncio
+import bisect
 import json
 import random
 import math
+import secrets
+import string
+import time
 from datetime import datetime
 from typing import Dict, Any, List
 
 from mcp.server import FastMCP
 
 # Initialize MCP server
+# FastMCP calls plain `def` tools inline on its event loop, so tools that do I/O
+# must be `async def` with async libraries (or offload via asyncio.to_thread)
 mcp = FastMCP("Multi-Tool Server")
 
 # Sample data for tools
-QUOTES = [
+QUOTES = (
     "The only way to do great work is to love what you do. - Steve Jobs",
     "Innovation distinguishes between a leader and a follower. - Steve Jobs",
     "Life is what happens to you while you're busy making other plans. - John Lennon",
@@ -24,7 +30,7 @@ QUOTES = [
     "It is during our darkest moments that we must focus to see the light. - Aristotle",
     "Success is not final, failure is not fatal: it is the courage to continue that counts. - Winston Churchill",
     "The only impossible journey is the one you never begin. - Tony Robbins"
-]
+)
 
 WEATHER_DATA = {
     "New York": {"temp": 22, "condition": "Sunny", "humidity": 65},
@@ -34,6 +40,55 @@ WEATHER_DATA = {
     "Paris": {"temp": 18, "condition": "Overcast", "humidity": 72}
 }
 
+# Case-folded city name -> (display name, weather data)
+_WEATHER_DATA_CF = {city.casefold(): (city, data) for city, data in WEATHER_DATA.items()}
+
+# Password alphabets and a cryptographically secure generator
+PASSWORD_ALPHABET = string.ascii_letters + string.digits
+PASSWORD_ALPHABET_WITH_SYMBOLS = PASSWORD_ALPHABET + "!@#$%^&*"
+PASSWORD_STRENGTHS = ("Weak", "Medium", "Strong")
+PASSWORD_STRENGTH_THRESHOLDS = (8, 12)
+_secure_random = secrets.SystemRandom()
+
+# BMI categories and the upper bounds separating them
+BMI_CATEGORIES = ("Underweight", "Normal weight", "Overweight", "Obese")
+BMI_THRESHOLDS = (18.5, 25, 30)
+
+# Direct conversions for every (from_unit, to_unit) pair
+TEMPERATURE_CONVERSIONS = {
+    ('C', 'C'): lambda t: t,
+    ('C', 'F'): lambda t: t * 9/5 + 32,
+    ('C', 'K'): lambda t: t + 273.15,
+    ('F', 'C'): lambda t: (t - 32) * 5/9,
+    ('F', 'F'): lambda t: t,
+    ('F', 'K'): lambda t: (t - 32) * 5/9 + 273.15,
+    ('K', 'C'): lambda t: t - 273.15,
+    ('K', 'F'): lambda t: (t - 273.15) * 9/5 + 32,
+    ('K', 'K'): lambda t: t,
+}
+
+def _r2(x: float) -> float:
+    """Round to 2 decimal places, halves away from zero (currency style)"""
+    scaled = x * 100
+    if not math.isfinite(scaled):
+        # int() rejects inf/NaN (including overflow from scaling); round() passes them through
+        return round(x, 2)
+    return int(scaled + (0.5 if x >= 0 else -0.5)) / 100
+
+# Timestamp cache, refreshed at most once per second
+_last_ts_sec = 0
+_last_ts_str = ""
+
+def _now_iso() -> str:
+    """Current local time as an ISO 8601 string with second precision"""
+    global _last_ts_sec, _last_ts_str
+    
+    now_sec = int(time.time())
+    if now_sec != _last_ts_sec:
+        _last_ts_sec = now_sec
+        _last_ts_str = datetime.fromtimestamp(now_sec).isoformat()
+    return _last_ts_str
+
 @mcp.tool()
 def calculate_bmi(weight: float, height: float) -> Dict[str, Any]:
     """
@@ -50,15 +105,7 @@ def calculate_bmi(weight: float, height: float) -> Dict[str, Any]:
         return {"error": "Weight and height must be positive values"}
     
     bmi = weight / (height ** 2)
-    
-    if bmi < 18.5:
-        category = "Underweight"
-    elif bmi < 25:
-        category = "Normal weight"
-    elif bmi < 30:
-        category = "Overweight"
-    else:
-        category = "Obese"
+    category = BMI_CATEGORIES[bisect.bisect_right(BMI_THRESHOLDS, bmi)]
     
     return {
         "bmi": round(bmi, 2),
@@ -68,7 +115,7 @@ def calculate_bmi(weight: float, height: float) -> Dict[str, Any]:
     }
 
 @mcp.tool()
-def get_weather(city: str = "New York") -> Dict[str, Any]:
+async def get_weather(city: str = "New York") -> Dict[str, Any]:
     """
     Get weather information for a specified city.
     
@@ -78,21 +125,19 @@ def get_weather(city: str = "New York") -> Dict[str, Any]:
     Returns:
         Dictionary with weather information
     """
-    city_title = city.title()
+    known = _WEATHER_DATA_CF.get(city.casefold())
     
-    if city_title in WEATHER_DATA:
-        weather = WEATHER_DATA[city_title].copy()
-        weather["city"] = city_title
-        weather["timestamp"] = datetime.now().isoformat()
-        return weather
+    if known:
+        city_name, data = known
+        return {**data, "city": city_name, "timestamp": _now_iso()}
     else:
         # Return random weather data for unknown cities
         return {
-            "city": city_title,
+            "city": city.title(),
             "temp": random.randint(10, 35),
             "condition": random.choice(["Sunny", "Cloudy", "Rainy", "Partly Cloudy", "Overcast"]),
             "humidity": random.randint(40, 90),
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _now_iso(),
             "note": "Simulated data for unknown city"
         }
 
@@ -104,10 +149,9 @@ def get_random_quote() -> Dict[str, str]:
     Returns:
         Dictionary with a random quote
     """
-    quote = random.choice(QUOTES)
     return {
-        "quote": quote,
-        "timestamp": datetime.now().isoformat()
+        "quote": random.choice(QUOTES),
+        "timestamp": _now_iso()
     }
 
 @mcp.tool()
@@ -128,7 +172,7 @@ def calculate_compound_interest(principal: float, rate: float, time: float, comp
         return {"error": "Invalid input values"}
     
     rate_decimal = rate / 100
-    amount = principal * (1 + rate_decimal / compound_frequency) ** (compound_frequency * time)
+    amount = principal * math.pow(1 + rate_decimal / compound_frequency, compound_frequency * time)
     interest = amount - principal
     
     return {
@@ -136,8 +180,8 @@ def calculate_compound_interest(principal: float, rate: float, time: float, comp
         "rate": rate,
         "time": time,
         "compound_frequency": compound_frequency,
-        "final_amount": round(amount, 2),
-        "interest_earned": round(interest, 2)
+        "final_amount": _r2(amount),
+        "interest_earned": _r2(interest)
     }
 
 @mcp.tool()
@@ -152,22 +196,17 @@ def generate_password(length: int = 12, include_symbols: bool = True) -> Dict[st
     Returns:
         Dictionary with generated password
     """
-    import string
-    
     if length < 4:
         return {"error": "Password length must be at least 4 characters"}
     
-    characters = string.ascii_letters + string.digits
-    if include_symbols:
-        characters += "!@#$%^&*"
-    
-    password = ''.join(random.choice(characters) for _ in range(length))
+    characters = PASSWORD_ALPHABET_WITH_SYMBOLS if include_symbols else PASSWORD_ALPHABET
+    password = ''.join(_secure_random.choices(characters, k=length))
     
     return {
         "password": password,
         "length": length,
         "includes_symbols": include_symbols,
-        "strength": "Strong" if length >= 12 else "Medium" if length >= 8 else "Weak"
+        "strength": PASSWORD_STRENGTHS[bisect.bisect_right(PASSWORD_STRENGTH_THRESHOLDS, length)]
     }
 
 @mcp.tool()
@@ -186,25 +225,11 @@ def convert_temperature(temperature: float, from_unit: str, to_unit: str) -> Dic
     from_unit = from_unit.upper()
     to_unit = to_unit.upper()
     
-    valid_units = ['C', 'F', 'K']
-    if from_unit not in valid_units or to_unit not in valid_units:
+    convert = TEMPERATURE_CONVERSIONS.get((from_unit, to_unit))
+    if convert is None:
         return {"error": "Units must be C (Celsius), F (Fahrenheit), or K (Kelvin)"}
     
-    # Convert to Celsius first
-    if from_unit == 'F':
-        celsius = (temperature - 32) * 5/9
-    elif from_unit == 'K':
-        celsius = temperature - 273.15
-    else:
-        celsius = temperature
-    
-    # Convert from Celsius to target unit
-    if to_unit == 'F':
-        result = celsius * 9/5 + 32
-    elif to_unit == 'K':
-        result = celsius + 273.15
-    else:
-        result = celsius
+    result = convert(temperature)
     
     return {
         "original_temperature": temperature,
@@ -236,10 +261,10 @@ def calculate_tip(bill_amount: float, tip_percentage: float = 15.0, num_people:
     return {
         "bill_amount": bill_amount,
         "tip_percentage": tip_percentage,
-        "tip_amount": round(tip_amount, 2),
-        "total_amount": round(total_amount, 2),
+        "tip_amount": _r2(tip_amount),
+        "total_amount": _r2(total_amount),
         "num_people": num_people,
-        "per_person": round(per_person, 2)
+        "per_person": _r2(per_person)
     }
 
 if __name__ == "__main__":
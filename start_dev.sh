@@ -74,7 +74,7 @@ sleep 2
 # Start backend server in background
 echo "🚀 Starting Backend Server (port 8000)..."
 cd backend
-python main.py &
+DEV=1 python main.py &
 BACKEND_PID=$!
 cd ..
 
@@ -0,0 +1,206 @@
+"""
+Tests for MCPAgentHandler query processing and streaming
+"""
+
+import asyncio
+
+from llama_index.core.agent.workflow import AgentStream, ToolCallResult
+from llama_index.core.tools import ToolOutput
+
+from mcp_agents.handler_agent import MCPAgentHandler, ResponseCache
+
+class StubHandler:
+    """Stands in for a WorkflowHandler: streams fixed events and can be awaited"""
+
+    def __init__(self, events):
+        self.events = events
+        self.finished = False
+        self.cancelled = False
+
+    async def stream_events(self):
+        for event in self.events:
+            await asyncio.sleep(0)
+            yield event
+        self.finished = True
+
+    def __await__(self):
+        return asyncio.sleep(0, result="done").__await__()
+
+    def done(self):
+        return self.finished
+
+    async def cancel_run(self):
+        self.cancelled = True
+
+class StubAgent:
+    def __init__(self, events):
+        self.events = events
+        self.queries = []
+        self.handlers = []
+
+    def run(self, user_msg):
+        self.queries.append(user_msg)
+        handler = StubHandler(self.events)
+        self.handlers.append(handler)
+        return handler
+
+def stream_event(delta):
+    return AgentStream(delta=delta, response="", current_agent_name="Agent", tool_calls=[], raw=None)
+
+def tool_output(name, is_error=False):
+    return ToolOutput(content="", tool_name=name, raw_input={}, raw_output=None, is_error=is_error)
+
+def tool_result(name, is_error=False):
+    return ToolCallResult(
+        tool_name=name,
+        tool_kwargs={},
+        tool_id="call-1",
+        tool_output=tool_output(name, is_error=is_error),
+        return_direct=False,
+    )
+
+class StubChatResponse:
+    def __init__(self, text, sources):
+        self.text = text
+        self.sources = sources
+
+    def __str__(self):
+        return self.text
+
+class StubChatAgent:
+    """Stands in for agent_worker.as_agent(): answers achat with a fixed response"""
+
+    def __init__(self, text, sources):
+        self.text = text
+        self.sources = sources
+        self.queries = []
+
+    def as_agent(self):
+        return self
+
+    async def achat(self, query):
+        self.queries.append(query)
+        return StubChatResponse(self.text, self.sources)
+
+def make_handler(agent):
+    handler = MCPAgentHandler(api_key="test-key")
+    handler.response_cache = ResponseCache()
+
+    async def get_cached(tools):
+        return agent
+
+    handler.get_cached_stream_agent = get_cached
+    handler.get_cached_agent = get_cached
+    return handler
+
+async def collect(stream):
+    return [token async for token in stream]
+
+def test_process_query_stream_yields_agent_deltas():
+    agent = StubAgent([
+        stream_event("Your BMI "),
+        tool_result("calculate_bmi"),
+        stream_event(""),
+        stream_event("is 22.86."),
+    ])
+    handler = make_handler(agent)
+
+    tokens = asyncio.run(collect(handler.process_query_stream("BMI for 70kg and 1.75m", tools=[])))
+
+    assert tokens == ["Your BMI ", "is 22.86."]
+    assert agent.queries == ["BMI for 70kg and 1.75m"]
+
+def test_process_query_stream_caches_by_tool_ttl():
+    async def scenario():
+        agent = StubAgent([tool_result("calculate_bmi"), stream_event("22.86")])
+        handler = make_handler(agent)
+        first = await collect(handler.process_query_stream("BMI for 70kg", tools=[]))
+        second = await collect(handler.process_query_stream("BMI for 70kg", tools=[]))
+        return agent, first, second
+
+    agent, first, second = asyncio.run(scenario())
+    assert first == second == ["22.86"]
+    assert len(agent.queries) == 1
+
+def test_process_query_stream_skips_cache_for_uncacheable_tools():
+    async def scenario():
+        agent = StubAgent([tool_result("generate_password"), stream_event("s3cret!")])
+        handler = make_handler(agent)
+        await collect(handler.process_query_stream("Generate a password", tools=[]))
+        await collect(handler.process_query_stream("Generate a password", tools=[]))
+        return agent
+
+    assert len(asyncio.run(scenario()).queries) == 2
+
+def test_process_query_stream_skips_cache_when_a_tool_failed():
+    async def scenario():
+        agent = StubAgent([
+            tool_result("calculate_bmi", is_error=True),
+            stream_event("Sorry, the BMI tool is unavailable."),
+        ])
+        handler = make_handler(agent)
+        await collect(handler.process_query_stream("BMI for 70kg", tools=[]))
+        await collect(handler.process_query_stream("BMI for 70kg", tools=[]))
+        return agent
+
+    assert len(asyncio.run(scenario()).queries) == 2
+
+def test_process_query_stream_cancels_run_when_closed_early():
+    async def scenario():
+        agent = StubAgent([stream_event("one "), stream_event("two")])
+        handler = make_handler(agent)
+        stream = handler.process_query_stream("Tell me something", tools=[])
+        assert await stream.__anext__() == "one "
+        await stream.aclose()
+        return agent
+
+    assert asyncio.run(scenario()).handlers[0].cancelled
+
+def test_process_query_caches_successful_tool_answers():
+    async def scenario():
+        agent = StubChatAgent("Your BMI is 22.86.", [tool_output("calculate_bmi")])
+        handler = make_handler(agent)
+        first = await handler.process_query("BMI for 70kg", tools=[])
+        second = await handler.process_query("BMI for 70kg", tools=[])
+        return agent, first, second
+
+    agent, first, second = asyncio.run(scenario())
+    assert first == second == "Your BMI is 22.86."
+    assert len(agent.queries) == 1
+
+def test_process_query_skips_cache_when_a_tool_failed():
+    async def scenario():
+        agent = StubChatAgent("Sorry, the BMI tool is unavailable.", [tool_output("calculate_bmi", is_error=True)])
+        handler = make_handler(agent)
+        await handler.process_query("BMI for 70kg", tools=[])
+        await handler.process_query("BMI for 70kg", tools=[])
+        return agent
+
+    assert len(asyncio.run(scenario()).queries) == 2
+
+def test_tool_list_is_fetched_once_for_agents_and_tools_info():
+    from llama_index.core.tools import FunctionTool
+    from llama_index.tools.mcp import McpToolSpec
+
+    def calculate_bmi(weight: float, height: float) -> float:
+        """Calculate BMI"""
+        return weight / height ** 2
+
+    fetches = []
+    spec = McpToolSpec.__new__(McpToolSpec)
+
+    async def to_tool_list_async():
+        fetches.append(True)
+        return [FunctionTool.from_defaults(fn=calculate_bmi)]
+
+    spec.to_tool_list_async = to_tool_list_async
+
+    async def scenario():
+        handler = MCPAgentHandler(api_key="test-key")
+        await handler.get_cached_agent([spec])
+        await handler.get_cached_stream_agent([spec])
+        return await handler.get_available_tools_info([spec])
+
+    tools_info = asyncio.run(scenario())
+    assert [info["name"] for info in tools_info] == ["calculate_bmi"]
+    assert len(fetches) == 1
@@ -0,0 +1,153 @@
+"""
+Tests for the FastAPI backend
+"""
+
+import asyncio
+import warnings
+
+import fastapi.exceptions
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import AppState, app, coalesce_tokens
+
+# Older FastAPI versions use plain DeprecationWarning
+FastAPIDeprecationWarning = getattr(fastapi.exceptions, "FastAPIDeprecationWarning", DeprecationWarning)
+
+class StubAgentHandler:
+    def __init__(self, tools_info=None, error=None):
+        self.tools_info = tools_info or []
+        self.error = error
+
+    async def process_query(self, query, tools):
+        return f"echo: {query}"
+
+    async def process_query_stream(self, query, tools):
+        for word in ("word " * 400).split(" "):
+            yield word + " "
+
+    async def get_available_tools_info(self, tools):
+        if self.error:
+            raise self.error
+        return self.tools_info
+
+def client_with(agent_handler):
+    # The lifespan is not run, so set up the state it would have created
+    ctx = AppState(mcp_tools=object(), agent_handler=agent_handler)
+    ctx.ready.set()
+    app.state.ctx = ctx
+    return TestClient(app)
+
+def test_tools_streams_one_object_per_line():
+    tools_info = [
+        {"name": "calculate_bmi", "description": "BMI", "parameters": {"type": "object"}},
+        {"name": "get_weather", "description": "Weather", "parameters": {"type": "object"}},
+    ]
+    response = client_with(StubAgentHandler(tools_info=tools_info)).get("/tools")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [orjson.loads(line) for line in response.text.splitlines()] == tools_info
+
+def test_tools_fetch_failure_returns_500():
+    response = client_with(StubAgentHandler(error=RuntimeError("MCP server down"))).get("/tools")
+
+    assert response.status_code == 500
+    assert "MCP server down" in response.json()["detail"]
+
+def test_tools_not_ready_returns_503():
+    app.state.ctx = AppState()
+    response = TestClient(app).get("/tools")
+
+    assert response.status_code == 503
+
+def test_chat_returns_response_without_deprecation_warnings():
+    client = client_with(StubAgentHandler())
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FastAPIDeprecationWarning)
+        response = client.post("/chat", json={"message": "hi", "session_id": "s1"})
+
+    assert response.status_code == 200
+    assert response.json() == {"response": "echo: hi", "session_id": "s1", "tools_used": []}
+
+def test_large_json_responses_are_gzipped():
+    tools_info = [{"name": f"tool_{i}", "description": "x" * 100, "parameters": {}} for i in range(20)]
+    response = client_with(StubAgentHandler(tools_info=tools_info)).get("/tools", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 20
+
+def test_chat_stream_is_not_gzipped():
+    client = client_with(StubAgentHandler())
+    response = client.post("/chat/stream", json={"message": "hi"}, headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["content-encoding"] == "identity"
+    assert response.text.startswith("data: ")
+
+async def timed_tokens(schedule, error=None):
+    """Yield each token after its delay in seconds, then optionally raise"""
+    for delay, token in schedule:
+        await asyncio.sleep(delay)
+        yield token
+    if error:
+        raise error
+
+async def collect_chunks(tokens, **options):
+    return [chunk async for chunk in coalesce_tokens(tokens, **options)]
+
+def test_coalesce_passes_first_token_then_batches():
+    schedule = [(0, "a"), (0, "b"), (0, "c"), (0, "d")]
+    chunks = asyncio.run(collect_chunks(timed_tokens(schedule), max_delay=0.05))
+
+    assert chunks == ["a", "bcd"]
+
+def test_coalesce_flushes_after_max_delay():
+    schedule = [(0, "a"), (0, "b"), (0.2, "c")]
+    chunks = asyncio.run(collect_chunks(timed_tokens(schedule), max_delay=0.02))
+
+    assert chunks == ["a", "b", "c"]
+
+def test_coalesce_flushes_at_max_chunk_size():
+    schedule = [(0, "first"), (0, "xx"), (0, "yy"), (0, "z")]
+    chunks = asyncio.run(collect_chunks(timed_tokens(schedule), max_chunk_size=4, max_delay=1.0))
+
+    assert chunks == ["first", "xxyy", "z"]
+
+def test_coalesce_flushes_buffer_before_reraising():
+    received = []
+
+    async def scenario():
+        schedule = [(0, "a"), (0, "b"), (0, "c")]
+        async for chunk in coalesce_tokens(timed_tokens(schedule, error=RuntimeError("LLM failed")), max_delay=1.0):
+            received.append(chunk)
+
+    with pytest.raises(RuntimeError, match="LLM failed"):
+        asyncio.run(scenario())
+    assert received == ["a", "bc"]
+
+def test_coalesce_closes_upstream_when_consumer_stops():
+    closed = []
+
+    async def upstream(schedule):
+        try:
+            for delay, token in schedule:
+                await asyncio.sleep(delay)
+                yield token
+        finally:
+            closed.append(True)
+
+    async def scenario(schedule, chunks_to_read, **options):
+        closed.clear()
+        tokens = upstream(schedule)  # Held here so only an explicit close can run its finally
+        stream = coalesce_tokens(tokens, **options)
+        chunks = [await stream.__anext__() for _ in range(chunks_to_read)]
+        await stream.aclose()
+        return chunks, list(closed)
+
+    # Stopped right after the first-token passthrough, with no read in flight
+    assert asyncio.run(scenario([(0, "a"), (0, "b")], 1)) == (["a"], [True])
+
+    # Stopped after a timed flush, while the next read is still pending
+    assert asyncio.run(scenario([(0, "a"), (0, "b"), (1.0, "c")], 2, max_delay=0.02)) == (["a", "b"], [True])
@@ -0,0 +1,26 @@
+"""
+Tests for the multi-tool MCP server helpers
+"""
+
+import math
+
+from mcp_server.multi_tool_mcp_server import _r2, calculate_compound_interest, calculate_tip
+
+def test_r2_rounds_halves_away_from_zero():
+    assert _r2(0.125) == 0.13
+    assert _r2(-0.125) == -0.13
+    assert _r2(10.0) == 10.0
+
+def test_r2_passes_through_non_finite_values():
+    assert _r2(math.inf) == math.inf
+    assert _r2(-math.inf) == -math.inf
+    assert math.isnan(_r2(math.nan))
+
+def test_calculate_tip_handles_huge_bill():
+    result = calculate_tip(bill_amount=1e308, tip_percentage=100)
+    assert result["total_amount"] == math.inf
+
+def test_calculate_compound_interest_matches_formula():
+    result = calculate_compound_interest(principal=1000, rate=5, time=10)
+    assert result["final_amount"] == 1628.89
+    assert result["interest_earned"] == 628.89
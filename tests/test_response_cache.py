@@ -0,0 +1,188 @@
+"""
+Tests for the two-tier ResponseCache in mcp_agents.handler_agent
+"""
+
+import asyncio
+
+import numpy as np
+
+from mcp_agents import handler_agent
+from mcp_agents.handler_agent import ResponseCache
+
+TOOL_KEY = 1
+
+class FakeEmbedModel:
+    """Embedding model returning fixed vectors, yielding to the loop like a real API call"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = []
+
+    async def aget_query_embedding(self, query):
+        self.calls.append(query)
+        await asyncio.sleep(0)
+        return self.vectors[query]
+
+def run(coro):
+    return asyncio.run(coro)
+
+def live_rows(cache):
+    return int(cache._live.sum())
+
+def test_exact_hit_ignores_case_and_whitespace():
+    async def scenario():
+        cache = ResponseCache()
+        await cache.put("Give me a Quote", TOOL_KEY, "answer", ttl_seconds=60)
+        assert await cache.get("  give me   a quote ", TOOL_KEY) == "answer"
+        assert await cache.get("give me a quote", TOOL_KEY + 1) is None
+
+    run(scenario())
+
+def test_semantic_hit_above_threshold():
+    embed = FakeEmbedModel({
+        "what's the weather in tokyo?": [1.0, 0.0],
+        "tokyo weather please": [0.99, 0.05],
+        "tell me a joke": [0.0, 1.0],
+    })
+
+    async def scenario():
+        cache = ResponseCache(embed_model=embed)
+        await cache.put("What's the weather in Tokyo?", TOOL_KEY, "sunny", ttl_seconds=60, semantic=True)
+        assert await cache.get("Tokyo weather please", TOOL_KEY) == "sunny"
+        assert await cache.get("Tell me a joke", TOOL_KEY) is None
+
+    run(scenario())
+
+def test_semantic_hit_requires_same_numbers():
+    embed = FakeEmbedModel({
+        "bmi for 70kg and 1.75m": [1.0, 0.0],
+        "bmi for 75kg and 1.75m": [1.0, 0.0],
+        "what is the bmi for 70kg and 1.75m": [1.0, 0.01],
+    })
+
+    async def scenario():
+        cache = ResponseCache(embed_model=embed)
+        await cache.put("BMI for 70kg and 1.75m", TOOL_KEY, "22.86", ttl_seconds=60, semantic=True)
+        assert await cache.get("BMI for 75kg and 1.75m", TOOL_KEY) is None
+        assert await cache.get("What is the BMI for 70kg and 1.75m", TOOL_KEY) == "22.86"
+
+    run(scenario())
+
+def test_tool_answers_are_exact_match_only():
+    embed = FakeEmbedModel({
+        "convert 100c to f": [1.0, 0.0],
+        "convert 100f to c": [1.0, 0.001],
+    })
+
+    async def scenario():
+        cache = ResponseCache(embed_model=embed)
+        await cache.put("Convert 100C to F", TOOL_KEY, "212.0", ttl_seconds=60)
+        assert await cache.get("Convert 100F to C", TOOL_KEY) is None
+        assert await cache.get("convert 100c to f", TOOL_KEY) == "212.0"
+        assert embed.calls == []
+
+    run(scenario())
+
+def test_failed_embedding_is_retried():
+    class FlakyEmbedModel(FakeEmbedModel):
+        async def aget_query_embedding(self, query):
+            if not self.calls:
+                self.calls.append(query)
+                raise RuntimeError("rate limited")
+            return await super().aget_query_embedding(query)
+
+    embed = FlakyEmbedModel({"hello there": [1.0, 0.0]})
+
+    async def scenario():
+        cache = ResponseCache(embed_model=embed)
+        await cache.put("hello there", TOOL_KEY, "hi", ttl_seconds=60, semantic=True)
+        assert cache._entries[("hello there", TOOL_KEY)].row is None
+
+        await cache.put("hello there", TOOL_KEY, "hi", ttl_seconds=60, semantic=True)
+        assert cache._entries[("hello there", TOOL_KEY)].row is not None
+        assert len(embed.calls) == 2
+
+    run(scenario())
+
+def test_expired_entry_is_evicted(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(handler_agent.time, "monotonic", lambda: clock[0])
+    embed = FakeEmbedModel({"convert 100f to c": [1.0, 0.0]})
+
+    async def scenario():
+        cache = ResponseCache(embed_model=embed)
+        await cache.put("Convert 100F to C", TOOL_KEY, "37.78", ttl_seconds=10, semantic=True)
+        clock[0] += 11
+        assert await cache.get("Convert 100F to C", TOOL_KEY) is None
+        assert not cache._entries
+        assert live_rows(cache) == 0
+
+    run(scenario())
+
+def test_zero_ttl_is_not_stored():
+    async def scenario():
+        cache = ResponseCache()
+        await cache.put("generate a password", TOOL_KEY, "secret", ttl_seconds=0)
+        assert await cache.get("generate a password", TOOL_KEY) is None
+
+    run(scenario())
+
+def test_lru_eviction_reuses_rows():
+    embed = FakeEmbedModel({
+        "a": [1.0, 0.0, 0.0],
+        "b": [0.0, 1.0, 0.0],
+        "c": [0.0, 0.0, 1.0],
+    })
+
+    async def scenario():
+        cache = ResponseCache(embed_model=embed, max_entries=2)
+        await cache.put("a", TOOL_KEY, "A", ttl_seconds=60, semantic=True)
+        await cache.put("b", TOOL_KEY, "B", ttl_seconds=60, semantic=True)
+        row_a = cache._entries[("a", TOOL_KEY)].row
+
+        # Touch "a" so "b" becomes least recently used
+        assert await cache.get("a", TOOL_KEY) == "A"
+        await cache.put("c", TOOL_KEY, "C", ttl_seconds=60, semantic=True)
+
+        assert await cache.get("b", TOOL_KEY) is None
+        assert await cache.get("a", TOOL_KEY) == "A"
+        assert await cache.get("c", TOOL_KEY) == "C"
+        assert cache._entries[("c", TOOL_KEY)].row != row_a
+        assert live_rows(cache) == 2
+        np.testing.assert_allclose(cache._embeddings[cache._entries[("c", TOOL_KEY)].row], [0.0, 0.0, 1.0])
+
+    run(scenario())
+
+def test_concurrent_puts_of_same_query_keep_one_row():
+    embed = FakeEmbedModel({"same": [1.0, 0.0]})
+
+    async def scenario():
+        cache = ResponseCache(embed_model=embed, max_entries=4)
+        await asyncio.gather(
+            cache.put("same", TOOL_KEY, "first", ttl_seconds=60, semantic=True),
+            cache.put("same", TOOL_KEY, "second", ttl_seconds=60, semantic=True),
+        )
+        assert len(cache._entries) == 1
+        assert live_rows(cache) == 1
+        assert len(cache._free_rows) == 3
+
+    run(scenario())
+
+def test_concurrent_puts_when_nearly_full_do_not_run_out_of_rows():
+    embed = FakeEmbedModel({
+        "a": [1.0, 0.0, 0.0],
+        "b": [0.0, 1.0, 0.0],
+        "c": [0.0, 0.0, 1.0],
+    })
+
+    async def scenario():
+        cache = ResponseCache(embed_model=embed, max_entries=2)
+        await cache.put("a", TOOL_KEY, "A", ttl_seconds=60, semantic=True)
+        await asyncio.gather(
+            cache.put("b", TOOL_KEY, "B", ttl_seconds=60, semantic=True),
+            cache.put("c", TOOL_KEY, "C", ttl_seconds=60, semantic=True),
+        )
+        assert len(cache._entries) == 2
+        assert live_rows(cache) == 2
+
+    run(scenario())